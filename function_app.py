@@ -1,17 +1,51 @@
 import azure.functions as func
 import json
+import hashlib
+import hmac
+import os
 from fastmcp import FastMCP
-from src.server import create_fabric_mcp_server
+import logging
+from src.server import create_fabric_mcp_server, create_fabric_tools
+from src.metrics import PrecomputedMetrics
+from src.scheduler import current_client_id
 
 app = func.FunctionApp()
 
-# Initialize MCP server
-mcp_server = create_fabric_mcp_server()
+# Initialize MCP server; the timer trigger shares its scheduler and query stats
+tools = create_fabric_tools()
+metrics_store = PrecomputedMetrics()
+mcp_server = create_fabric_mcp_server(tools, metrics_store)
+
+# Comma-separated list of accepted client API keys
+API_KEYS = [key.strip() for key in os.getenv("API_KEY", "").split(",") if key.strip()]
+
+@app.schedule(schedule="%METRICS_REFRESH_SCHEDULE%", arg_name="timer",
+              run_on_startup=False, use_monitor=True)
+async def refresh_precomputed_metrics(timer: func.TimerRequest) -> None:
+    """Recompute the summary queries served by get_precomputed_metric"""
+    current_client_id.set("precomputed-metrics")
+    result = await metrics_store.refresh(tools)
+    
+    if result["failed"]:
+        logging.warning(f"Metric refresh failed for: {result['failed']}")
+    logging.info(f"Refreshed precomputed metrics: {', '.join(result['refreshed'])}")
+
+def get_client_id(req: func.HttpRequest) -> str:
+    """Derive a stable client identifier from a configured API key"""
+    api_key = req.headers.get("x-api-key") or ""
+    
+    # Unknown keys share one identity so a client cannot mint fresh rate limits
+    if not any(hmac.compare_digest(api_key.encode(), key.encode()) for key in API_KEYS):
+        return "anonymous"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
 
 @app.route(route="mcp/{*path}", methods=["GET", "POST"])
 async def mcp_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Handle MCP protocol requests"""
     try:
+        # Identify the calling client for per-client admission control
+        current_client_id.set(get_client_id(req))
+        
         # Get the path after /mcp/
         path = req.route_params.get('path', '')
         
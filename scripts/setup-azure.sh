@@ -88,7 +88,8 @@ az functionapp config appsettings set \
   --settings \
     "APPINSIGHTS_INSTRUMENTATIONKEY=$INSTRUMENTATION_KEY" \
     "STORAGE_ACCOUNT_NAME=$STORAGE_ACCOUNT" \
-    "STORAGE_ACCOUNT_KEY=$STORAGE_KEY"
+    "STORAGE_ACCOUNT_KEY=$STORAGE_KEY" \
+    "METRICS_REFRESH_SCHEDULE=0 0 */6 * * *"
 
 # Create service principal for GitHub Actions
 echo "\nCreating service principal for GitHub Actions..."
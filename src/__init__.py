@@ -8,11 +8,19 @@ from .fabric_client import FabricClient
 from .tools import FabricTools
 from .resources import InsightsMemo
 from .prompts import FabricPrompts
+from .metrics import PrecomputedMetrics
+from .scheduler import QueryScheduler
+from .prompt_context import PromptContextBuilder
+from .query_stats import QueryStats
 
 __all__ = [
     "create_fabric_mcp_server",
     "FabricClient",
     "FabricTools",
     "InsightsMemo",
-    "FabricPrompts"
+    "FabricPrompts",
+    "PrecomputedMetrics",
+    "QueryScheduler",
+    "PromptContextBuilder",
+    "QueryStats"
 ]
\ No newline at end of file
@@ -3,6 +3,7 @@ from typing import Dict, List, Any
 import pandas as pd
 from datetime import datetime, timedelta
 import json
+import re
 
 class FabricClient:
     """Client for Microsoft Fabric API interactions"""
@@ -76,11 +77,13 @@ class FabricClient:
                     error = await response.text()
                     raise Exception(f"Query failed: {error}")
                 
-                result = await response.json()
+                body = await response.read()
+                result = json.loads(body)
                 return {
                     "columns": result.get("columns", []),
                     "rows": result.get("rows", []),
-                    "row_count": len(result.get("rows", []))
+                    "row_count": len(result.get("rows", [])),
+                    "bytes": len(body)
                 }
     
     def _is_safe_query(self, query: str) -> bool:
@@ -90,5 +93,6 @@ class FabricClient:
             "ALTER", "TRUNCATE", "EXEC", "EXECUTE"
         ]
         
-        query_upper = query.upper()
-        return not any(keyword in query_upper for keyword in dangerous_keywords)
\ No newline at end of file
+        # Whole words only, so names like created_at or order_updates are allowed
+        pattern = r"\b(?:" + "|".join(dangerous_keywords) + r")\b"
+        return re.search(pattern, query, re.IGNORECASE) is None
\ No newline at end of file
@@ -0,0 +1,221 @@
+from typing import Dict, List, Any, Optional
+from datetime import datetime
+import json
+import os
+import re
+import time
+from azure.storage.blob import BlobServiceClient
+
+# Summary queries backing the built-in BI prompts. Override with the
+# PRECOMPUTED_METRICS app setting (JSON object of name -> {query, tables, description}).
+DEFAULT_METRIC_QUERIES = {
+    "monthly_sales_trend": {
+        "description": "Monthly revenue, order count and month-over-month growth",
+        "tables": ["sales_data"],
+        "query": """SELECT YEAR(order_date) AS year, MONTH(order_date) AS month,
+       SUM(revenue) AS revenue, COUNT(*) AS orders
+FROM sales_data
+GROUP BY YEAR(order_date), MONTH(order_date)
+ORDER BY year, month"""
+    },
+    "top_products": {
+        "description": "Top 10 products by revenue with share of total sales",
+        "tables": ["sales_data"],
+        "query": """SELECT TOP 10 product_name, SUM(revenue) AS revenue,
+       SUM(revenue) * 100.0 / (SELECT SUM(revenue) FROM sales_data) AS revenue_pct
+FROM sales_data
+GROUP BY product_name
+ORDER BY revenue DESC"""
+    },
+    "yoy_comparison": {
+        "description": "Revenue per year with year-over-year growth",
+        "tables": ["sales_data"],
+        "query": """SELECT YEAR(order_date) AS year, SUM(revenue) AS revenue
+FROM sales_data
+GROUP BY YEAR(order_date)
+ORDER BY year"""
+    },
+    "category_breakdown": {
+        "description": "Revenue per product category per year",
+        "tables": ["sales_data"],
+        "query": """SELECT category, YEAR(order_date) AS year, SUM(revenue) AS revenue
+FROM sales_data
+GROUP BY category, YEAR(order_date)
+ORDER BY category, year"""
+    }
+}
+
+class PrecomputedMetrics:
+    """Snapshot store for scheduled summary queries"""
+
+    def __init__(self, metric_queries: Optional[Dict[str, Dict[str, Any]]] = None,
+                 reload_interval: int = 300):
+        # Use Azure Blob Storage for persistence, shared across function instances
+        self.storage_account = os.getenv("STORAGE_ACCOUNT_NAME")
+        self.storage_key = os.getenv("STORAGE_ACCOUNT_KEY")
+        self.container_name = "insights"
+        self.blob_name = "precomputed_metrics.json"
+
+        self.metric_queries = self._validate(metric_queries or self._load_config())
+        self.reload_interval = reload_interval  # seconds
+        self.snapshots: Dict[str, Dict[str, Any]] = {}
+        self.last_refreshed = None
+        self._loaded_at = 0.0
+        self._load_snapshots()
+
+    def _load_config(self) -> Dict[str, Dict[str, Any]]:
+        """Load metric definitions from the PRECOMPUTED_METRICS setting"""
+        raw = os.getenv("PRECOMPUTED_METRICS")
+        if not raw:
+            return DEFAULT_METRIC_QUERIES
+        try:
+            config = json.loads(raw)
+        except ValueError as e:
+            print(f"Invalid PRECOMPUTED_METRICS setting, using defaults: {e}")
+            return DEFAULT_METRIC_QUERIES
+        if not isinstance(config, dict):
+            print("Invalid PRECOMPUTED_METRICS setting, using defaults: expected a JSON object")
+            return DEFAULT_METRIC_QUERIES
+        return config
+
+    @staticmethod
+    def _validate(metric_queries: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Drop metric definitions without a query so the valid ones still refresh"""
+        valid = {}
+        for name, definition in metric_queries.items():
+            if not isinstance(definition, dict) or not isinstance(definition.get("query"), str):
+                print(f"Skipping precomputed metric {name}: definition has no query")
+                continue
+            valid[name] = definition
+        return valid
+
+    def _get_blob_client(self):
+        blob_service = BlobServiceClient(
+            account_url=f"https://{self.storage_account}.blob.core.windows.net",
+            credential=self.storage_key
+        )
+        return blob_service.get_blob_client(
+            container=self.container_name,
+            blob=self.blob_name
+        )
+
+    def _load_snapshots(self):
+        """Load snapshots from Azure Blob Storage"""
+        self._loaded_at = time.monotonic()
+        if not self.storage_account:
+            return
+        try:
+            blob_client = self._get_blob_client()
+            if blob_client.exists():
+                stored_data = json.loads(blob_client.download_blob().readall())
+                self._merge_snapshots(stored_data.get("snapshots", {}),
+                                      stored_data.get("last_refreshed"))
+        except Exception as e:
+            print(f"Error loading metric snapshots: {e}")
+
+    def _merge_snapshots(self, stored: Dict[str, Dict[str, Any]], last_refreshed: Optional[str]):
+        """Keep whichever copy of each snapshot is newer, so an unsaved refresh is not rolled back"""
+        for name, snapshot in stored.items():
+            current = self.snapshots.get(name)
+            if current is None or snapshot.get("computed_at", "") > current.get("computed_at", ""):
+                self.snapshots[name] = snapshot
+        if last_refreshed and (self.last_refreshed is None or last_refreshed > self.last_refreshed):
+            self.last_refreshed = last_refreshed
+
+    def _save_snapshots(self):
+        """Save snapshots to Azure Blob Storage"""
+        if not self.storage_account:
+            return
+        data = {
+            "snapshots": self.snapshots,
+            "last_refreshed": self.last_refreshed
+        }
+        try:
+            self._get_blob_client().upload_blob(
+                data=json.dumps(data, separators=(",", ":"), default=str),
+                overwrite=True
+            )
+        except Exception as e:
+            # Still served from memory here; reloads merge rather than overwrite newer entries
+            print(f"Error saving metric snapshots: {e}")
+
+    @staticmethod
+    def _extract_tables(query: str) -> List[str]:
+        """Best-effort list of tables referenced by FROM/JOIN clauses"""
+        tables = re.findall(r"\b(?:FROM|JOIN)\s+([\w\.\[\]]+)", query, re.IGNORECASE)
+        return sorted(set(tables))
+
+    def _maybe_reload(self):
+        """Pick up snapshots written by the timer trigger on another instance"""
+        if time.monotonic() - self._loaded_at > self.reload_interval:
+            self._load_snapshots()
+
+    async def refresh(self, tools) -> Dict[str, Any]:
+        """Recompute every configured metric through FabricTools.execute_query"""
+        refreshed, failed = [], {}
+
+        for name, definition in self.metric_queries.items():
+            query = definition["query"]
+            # Own tool name so the refresh does not draw from read_query's tool bucket
+            result = await tools.execute_query(query, tool="precomputed_metrics")
+
+            if not result.get("success"):
+                # Keep serving the previous snapshot rather than dropping it
+                failed[name] = result.get("error", "Unknown error")
+                continue
+
+            columns = result["columns"]
+            self.snapshots[name] = {
+                "description": definition.get("description", ""),
+                "tables": definition.get("tables") or self._extract_tables(query),
+                "computed_at": datetime.now().isoformat(),
+                "columns": columns,
+                "rows": [[row[col] for col in columns] for row in result["data"]],
+                "row_count": result["row_count"]
+            }
+            refreshed.append(name)
+
+        if refreshed:
+            self.last_refreshed = datetime.now().isoformat()
+            self._save_snapshots()
+            self._loaded_at = time.monotonic()
+
+        return {
+            "success": not failed,
+            "refreshed": refreshed,
+            "failed": failed,
+            "refreshed_at": self.last_refreshed
+        }
+
+    def get_metric(self, name: str) -> Dict[str, Any]:
+        """Serve a stored snapshot by name"""
+        self._maybe_reload()
+        snapshot = self.snapshots.get(name)
+        if snapshot is None:
+            return {
+                "success": False,
+                "error": f"Unknown or not yet computed metric: {name}",
+                "available_metrics": self.list_metrics()
+            }
+
+        return {
+            "success": True,
+            "metric": name,
+            **snapshot
+        }
+
+    def list_metrics(self) -> List[Dict[str, Any]]:
+        """Describe configured metrics and when they were last computed"""
+        self._maybe_reload()
+        return [
+            {
+                "name": name,
+                "description": definition.get("description", ""),
+                "computed_at": self.snapshots.get(name, {}).get("computed_at")
+            }
+            for name, definition in self.metric_queries.items()
+        ]
+
+    def metric_names(self) -> List[str]:
+        """Get names of all configured metrics"""
+        return list(self.metric_queries.keys())
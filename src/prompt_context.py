@@ -0,0 +1,185 @@
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import re
+import time
+
+# Table/insight keywords used to pick what is relevant to each prompt
+CONTEXT_KEYWORDS = {
+    "sales": ["sales", "order", "product", "revenue", "customer", "category"],
+    "executive": ["sales", "revenue", "finance", "customer", "kpi", "target"],
+    "operational": ["production", "inventory", "supply", "order", "operation", "quality"],
+    "financial": ["finance", "revenue", "cost", "budget", "ledger", "account", "expense"],
+    "marketing": ["campaign", "marketing", "customer", "lead", "web", "channel"]
+}
+
+# Context queries run under their own scheduler identity, not the prompt caller's
+CONTEXT_CLIENT_ID = "prompt-context"
+
+DATE_TYPES = {"date", "datetime", "datetime2", "datetimeoffset", "smalldatetime", "timestamp"}
+
+class PromptContextBuilder:
+    """Build a compact, cached data context block for the BI prompts"""
+
+    def __init__(self, tools, insights_memo, ttl: int = 300, max_chars: int = 3000,
+                 max_tables: int = 5, max_columns: int = 20, build_timeout: float = 10,
+                 partial_ttl: int = 30):
+        self.tools = tools
+        self.insights_memo = insights_memo
+        self.ttl = ttl  # seconds
+        self.partial_ttl = partial_ttl  # seconds, for blocks where a sub-query failed
+        self.max_chars = max_chars
+        self.max_tables = max_tables
+        self.max_columns = max_columns
+        self.build_timeout = build_timeout  # seconds
+
+        self._cache: Dict[str, Tuple[float, str]] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def get_context(self, topic: str) -> str:
+        """Return the context block for a topic, rebuilding it when the TTL expires"""
+        if topic not in CONTEXT_KEYWORDS:
+            topic = "executive"  # same fallback as FabricPrompts.get_bi_report_prompt
+        cached = self._cache.get(topic)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        # Concurrent prompt requests share a single build
+        task = self._pending.get(topic)
+        if task is None:
+            task = self._pending[topic] = asyncio.ensure_future(self._refresh(topic))
+            task.add_done_callback(lambda _: self._pending.pop(topic, None))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.build_timeout)
+        except asyncio.TimeoutError:
+            # Serve the prompt without context now; the build finishes in the background
+            return cached[1] if cached else ""
+
+    async def _refresh(self, topic: str) -> str:
+        """Build and cache the context block, returning an empty block on failure"""
+        try:
+            context, complete = await self._build(topic)
+        except Exception as e:
+            # The prompt is still useful without context; never fail the prompt over it
+            print(f"Error building prompt context for {topic}: {e}")
+            return ""
+
+        # Retry soon when a sub-query failed (e.g. rate limited) instead of pinning a degraded block
+        ttl = self.ttl if complete else self.partial_ttl
+        self._cache[topic] = (time.monotonic() + ttl, context)
+        return context
+
+    async def _query(self, query: str) -> Dict[str, Any]:
+        return await self.tools.execute_query(
+            query, client_id=CONTEXT_CLIENT_ID, tool="prompt_context")
+
+    def _select_tables(self, tables: List[Dict[str, Any]], keywords: List[str]) -> List[Dict[str, Any]]:
+        """Pick the tables whose names match the topic keywords"""
+        matching = [
+            table for table in tables
+            if any(keyword in table["name"].lower() for keyword in keywords)
+        ]
+        return matching[:self.max_tables]
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return "[" + name.replace("]", "]]") + "]"
+
+    async def _get_columns(self, tables: List[Dict[str, Any]]) -> Optional[Dict[str, List[Tuple[str, str]]]]:
+        """Fetch column names and types for the selected tables in one query, or None on failure"""
+        names = ", ".join("'" + table["name"].replace("'", "''") + "'" for table in tables)
+        result = await self._query(
+            "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS "
+            f"WHERE TABLE_NAME IN ({names}) ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        )
+        if not result.get("success"):
+            return None
+
+        columns: Dict[str, List[Tuple[str, str]]] = {}
+        for row in result["data"]:
+            columns.setdefault(row["TABLE_NAME"], []).append(
+                (row["COLUMN_NAME"], row["DATA_TYPE"].lower()))
+        return columns
+
+    async def _get_table_stats(self, table: Dict[str, Any],
+                               columns: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Fetch the row count and date range of a table; "complete" is False on failure"""
+        date_column = next((name for name, data_type in columns if data_type in DATE_TYPES), None)
+        table_ref = f"{self._quote(table['schema'])}.{self._quote(table['name'])}"
+
+        select = ["COUNT_BIG(*) AS row_count"]
+        if date_column:
+            select += [f"MIN({self._quote(date_column)}) AS min_date",
+                       f"MAX({self._quote(date_column)}) AS max_date"]
+        result = await self._query(f"SELECT {', '.join(select)} FROM {table_ref}")
+
+        if not result.get("success") or not result["data"]:
+            return {"row_count": table.get("row_count"), "complete": False}
+        row = result["data"][0]
+        return {
+            "complete": True,
+            "row_count": row["row_count"],
+            "date_column": date_column,
+            "min_date": row.get("min_date"),
+            "max_date": row.get("max_date")
+        }
+
+    async def _build(self, topic: str) -> Tuple[str, bool]:
+        """Build the context block and whether every sub-query succeeded"""
+        keywords = CONTEXT_KEYWORDS[topic]
+
+        listing = await self.tools.list_tables()
+        tables = self._select_tables(listing.get("tables", []), keywords)
+
+        columns = await self._get_columns(tables) if tables else {}
+        complete = listing.get("success", False) and columns is not None
+        columns = columns or {}
+        stats = await asyncio.gather(*[
+            self._get_table_stats(table, columns.get(table["name"], []))
+            for table in tables
+        ])
+
+        insights = self.insights_memo.get_recent_insights(
+            category=topic, keywords=keywords, limit=3)
+
+        complete = complete and all(table_stats["complete"] for table_stats in stats)
+        return self._render(tables, columns, stats, insights), complete
+
+    def _render(self, tables: List[Dict[str, Any]], columns: Dict[str, List[Tuple[str, str]]],
+                stats: List[Dict[str, Any]], insights: List[Dict[str, Any]]) -> str:
+        """Render a compact markdown block no longer than max_chars"""
+        if not tables and not insights:
+            return ""
+
+        sections = ["Tables:"] if tables else []
+        for table, table_stats in zip(tables, stats):
+            table_columns = columns.get(table["name"], [])
+            shown = ", ".join(f"{name} ({data_type})" for name, data_type in table_columns[:self.max_columns])
+            if len(table_columns) > self.max_columns:
+                shown += f", ... (+{len(table_columns) - self.max_columns} more)"
+
+            section = f"- {table['schema']}.{table['name']}: {table_stats['row_count']} rows"
+            if table_stats.get("min_date") is not None:
+                section += (f", {table_stats['date_column']} from {table_stats['min_date']}"
+                            f" to {table_stats['max_date']}")
+            if shown:
+                section += f"\n  Columns: {shown}"
+            sections.append(section)
+
+        if insights:
+            sections.append("Recent insights:")
+        for insight in insights:
+            content = re.sub(r"\s+", " ", insight["content"])[:200]
+            sections.append(f"- {insight['created_at'][:10]} {insight['title']}: {content}")
+
+        header = ("\n\n**Data Context** (prefetched; use it instead of calling list_tables "
+                  "or probing queries)\n")
+        truncated = "- ... (truncated)\n"
+        block = header
+        for section in sections:
+            if len(block) + len(section) + len(truncated) + 1 > self.max_chars:
+                block += truncated
+                break
+            block += section + "\n"
+
+        return block.rstrip("\n")
@@ -4,8 +4,34 @@ from typing import Dict, Any
 class FabricPrompts:
     """Predefined prompts for BI analysis"""
     
-    def get_sales_analysis_prompt(self) -> str:
-        """Generate comprehensive sales analysis prompt"""
+    def __init__(self, metrics_store=None):
+        self.metrics_store = metrics_store
+    
+    def _get_precomputed_metrics_section(self) -> str:
+        """Point the model at scheduled snapshots instead of raw fact-table scans"""
+        if self.metrics_store is None:
+            return ""
+        
+        # Metrics that were never computed would only send the model into failing tool calls
+        metrics = [metric for metric in self.metrics_store.list_metrics() if metric["computed_at"]]
+        if not metrics:
+            return ""
+        
+        section = "\n\n**Precomputed Metrics**\n"
+        section += "These aggregates are refreshed on a schedule. Fetch them with the "
+        section += "get_precomputed_metric tool before writing queries against the raw tables:\n"
+        for metric in metrics:
+            section += f"- {metric['name']}: {metric['description']} (last computed: {metric['computed_at']})\n"
+        section += "Only use read_query for breakdowns these snapshots do not cover."
+        
+        return section
+    
+    def get_sales_analysis_prompt(self, context: str = "") -> str:
+        """Generate comprehensive sales analysis prompt, optionally with a data context block"""
+        return self._get_sales_analysis_template() + self._get_precomputed_metrics_section() + context
+    
+    def _get_sales_analysis_template(self) -> str:
+        """Sales analysis prompt template"""
         return """Perform a comprehensive sales data analysis with the following components:
 
 1. **Monthly Trends Analysis**
@@ -41,8 +67,8 @@ Please format the analysis in a clear, executive-friendly manner with:
 
 After completing the analysis, use the append_insight tool to save the key findings to the company insights memo."""
     
-    def get_bi_report_prompt(self, report_type: str, time_period: str) -> str:
-        """Generate BI report prompt based on type and period"""
+    def get_bi_report_prompt(self, report_type: str, time_period: str, context: str = "") -> str:
+        """Generate BI report prompt based on type and period, optionally with a data context block"""
         
         report_templates = {
             "executive": self._get_executive_report_template,
@@ -52,7 +78,7 @@ After completing the analysis, use the append_insight tool to save the key findi
         }
         
         template_func = report_templates.get(report_type, self._get_executive_report_template)
-        return template_func(time_period)
+        return template_func(time_period) + self._get_precomputed_metrics_section() + context
     
     def _get_executive_report_template(self, time_period: str) -> str:
         """Executive dashboard report template"""
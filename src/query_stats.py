@@ -0,0 +1,185 @@
+from typing import Dict, List, Any, Optional
+from collections import OrderedDict, deque
+from datetime import datetime
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+import time
+from azure.storage.blob import BlobServiceClient
+
+# One left-to-right pass, so "--" inside a literal is not a comment and digits
+# inside [bracketed] or "quoted" identifiers are not mistaken for numbers
+_TOKENS = re.compile(r"""
+    (?P<string>(?:(?<!\w)N)?'(?:[^']|'')*')
+  | (?P<identifier>\[(?:[^\]]|\]\])*\]|"(?:[^"]|"")*")
+  | (?P<number>(?<![\w.])(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?(?![\w.]))
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+""", re.DOTALL | re.VERBOSE)
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def _replace_token(match: "re.Match") -> str:
+    if match.group("identifier"):
+        return match.group("identifier")
+    if match.group("comment"):
+        return " "
+    return "?"
+
+def normalize_query(query: str) -> str:
+    """Normalize a query by replacing literals with placeholders"""
+    normalized = _TOKENS.sub(_replace_token, query)
+    normalized = _IN_LIST.sub("IN (?)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip().upper()
+
+def _hash(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+def fingerprint_query(query: str) -> str:
+    """Stable identifier shared by queries that differ only in literals"""
+    return _hash(normalize_query(query))
+
+class QueryStats:
+    """Bounded per-fingerprint query statistics and slow-query log"""
+
+    SORT_KEYS = {"count", "total_latency", "max_latency", "avg_latency", "rows", "bytes", "errors"}
+
+    def __init__(self, max_fingerprints: int = 500, slow_log_size: int = 50,
+                 slow_query_threshold: float = 1.0, flush_target: Optional[str] = None,
+                 flush_interval: int = 300):
+        self.max_fingerprints = max_fingerprints
+        self.slow_query_threshold = slow_query_threshold  # seconds
+        self.flush_target = flush_target  # "blob", a local file path, or None
+        self.flush_interval = flush_interval  # seconds
+
+        # Least recently seen fingerprints are evicted first
+        self.fingerprints: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.evicted = 0
+        self.since = datetime.now().isoformat()
+        self._last_flush = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "QueryStats":
+        """Create query stats from QUERY_STATS_* settings"""
+        return cls(
+            max_fingerprints=int(os.getenv("QUERY_STATS_MAX_FINGERPRINTS", "500")),
+            slow_log_size=int(os.getenv("QUERY_STATS_SLOW_LOG_SIZE", "50")),
+            slow_query_threshold=float(os.getenv("QUERY_STATS_SLOW_THRESHOLD", "1.0")),
+            flush_target=os.getenv("QUERY_STATS_FLUSH") or None,
+            flush_interval=int(os.getenv("QUERY_STATS_FLUSH_INTERVAL", "300"))
+        )
+
+    def record(self, query: str, latency: float, rows: int = 0, size: int = 0,
+               success: bool = True):
+        """Record one query execution"""
+        normalized = normalize_query(query)
+        fingerprint = _hash(normalized)
+
+        entry = self.fingerprints.get(fingerprint)
+        if entry is None:
+            if len(self.fingerprints) >= self.max_fingerprints:
+                self.fingerprints.popitem(last=False)
+                self.evicted += 1
+            entry = self.fingerprints[fingerprint] = {
+                "fingerprint": fingerprint,
+                "normalized_query": normalized,
+                "count": 0,
+                "errors": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "rows": 0,
+                "bytes": 0
+            }
+        else:
+            self.fingerprints.move_to_end(fingerprint)
+
+        entry["count"] += 1
+        entry["errors"] += 0 if success else 1
+        entry["total_latency"] += latency
+        entry["max_latency"] = max(entry["max_latency"], latency)
+        entry["rows"] += rows
+        entry["bytes"] += size
+        entry["last_seen"] = datetime.now().isoformat()
+
+        if latency >= self.slow_query_threshold:
+            # Normalized text only: the log is readable by every client and flushed to storage
+            self.slow_queries.append({
+                "fingerprint": fingerprint,
+                "normalized_query": normalized,
+                "latency": latency,
+                "rows": rows,
+                "bytes": size,
+                "success": success,
+                "executed_at": entry["last_seen"]
+            })
+
+    def top(self, n: int = 10, by: str = "total_latency") -> List[Dict[str, Any]]:
+        """Get the top N fingerprints ordered by the given statistic"""
+        if by not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {by}")
+
+        entries = [
+            {**entry, "avg_latency": entry["total_latency"] / entry["count"]}
+            for entry in self.fingerprints.values()
+        ]
+        return sorted(entries, key=lambda entry: entry[by], reverse=True)[:n]
+
+    def get_report(self, n: int = 10) -> Dict[str, Any]:
+        """Summarize the most frequent and most expensive queries"""
+        return {
+            "since": self.since,
+            "tracked_fingerprints": len(self.fingerprints),
+            "evicted_fingerprints": self.evicted,
+            "top_by_total_latency": self.top(n, "total_latency"),
+            "top_by_count": self.top(n, "count"),
+            "top_by_bytes": self.top(n, "bytes"),
+            "slowest_recent": sorted(self.slow_queries, key=lambda q: q["latency"], reverse=True)
+        }
+
+    def maybe_flush(self):
+        """Start a background flush if a flush target is configured and the interval has elapsed"""
+        if not self.flush_target or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        self._last_flush = time.monotonic()
+        # Snapshot on the event loop; only the I/O runs in a worker thread
+        self._flush_task = asyncio.create_task(self._flush_in_background(self._snapshot()))
+
+    async def _flush_in_background(self, snapshot: Dict[str, Any]):
+        try:
+            await asyncio.to_thread(self._write, snapshot)
+        except Exception as e:
+            print(f"Error flushing query stats: {e}")
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "flushed_at": datetime.now().isoformat(),
+            "instance": os.getenv("WEBSITE_INSTANCE_ID", socket.gethostname()),
+            "since": self.since,
+            "fingerprints": [dict(entry) for entry in self.fingerprints.values()],
+            "slow_queries": list(self.slow_queries)
+        }
+
+    def flush(self):
+        """Write a full snapshot to a local JSON-lines file or to blob storage"""
+        self._write(self._snapshot())
+
+    def _write(self, snapshot: Dict[str, Any]):
+        if self.flush_target == "blob":
+            blob_service = BlobServiceClient(
+                account_url=f"https://{os.getenv('STORAGE_ACCOUNT_NAME')}.blob.core.windows.net",
+                credential=os.getenv("STORAGE_ACCOUNT_KEY")
+            )
+            blob_client = blob_service.get_blob_client(
+                container="insights",
+                blob=f"query_stats/{snapshot['instance']}/{snapshot['flushed_at']}.json"
+            )
+            blob_client.upload_blob(data=json.dumps(snapshot, default=str), overwrite=True)
+        else:
+            with open(self.flush_target, "a") as f:
+                f.write(json.dumps(snapshot, default=str) + "\n")
@@ -123,6 +123,21 @@ class InsightsMemo:
         
         return md
     
+    def get_recent_insights(self, category: str = None, keywords: List[str] = None,
+                            limit: int = 5) -> List[Dict[str, Any]]:
+        """Get the most recent insights matching a category or any keyword"""
+        keywords = [keyword.lower() for keyword in keywords or []]
+        
+        matching = []
+        for insight in reversed(self.insights):
+            text = " ".join([insight["title"]] + insight["tags"]).lower()
+            if insight["category"] == category or any(keyword in text for keyword in keywords):
+                matching.append(insight)
+                if len(matching) >= limit:
+                    break
+        
+        return matching
+    
     def count(self) -> int:
         """Get total number of insights"""
         return len(self.insights)
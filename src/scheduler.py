@@ -0,0 +1,276 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+from collections import defaultdict
+from contextvars import ContextVar
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+
+# Identity of the MCP client issuing the current request (set by the HTTP handler)
+current_client_id: ContextVar[str] = ContextVar("current_client_id", default="anonymous")
+
+class SchedulerRejected(Exception):
+    """Raised when a request is refused admission"""
+
+    def __init__(self, message: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket rate limiter"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if available"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, tokens: float = 1) -> float:
+        """Seconds until the requested tokens are available"""
+        self._refill()
+        if self.rate <= 0:
+            return float("inf")
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+class QueryScheduler:
+    """Per-client admission control and weighted fair scheduling for queries"""
+
+    def __init__(self, max_concurrency: int = 4, client_rate: float = 2.0,
+                 client_burst: float = 10, max_queue_per_client: int = 10,
+                 queue_timeout: float = 30, client_weights: Optional[Dict[str, float]] = None,
+                 tool_rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 client_idle_timeout: float = 600,
+                 clock: Callable[[], float] = time.monotonic):
+        client_weights = client_weights or {}
+        for client_id, weight in client_weights.items():
+            if weight <= 0:
+                raise ValueError(f"Client weight must be positive: {client_id}={weight}")
+
+        self.max_concurrency = max_concurrency
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout  # seconds
+        self.client_weights = client_weights
+        self.client_idle_timeout = client_idle_timeout  # seconds
+        self.clock = clock
+
+        self.client_buckets: Dict[str, TokenBucket] = {}
+        self.tool_buckets = {
+            tool: TokenBucket(rate, burst, clock)
+            for tool, (rate, burst) in (tool_rates or {}).items()
+        }
+
+        # Start-time fair queuing: each request is tagged with a virtual finish
+        # time of max(virtual_time, client's last finish) + 1 / weight
+        self._queue = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = defaultdict(float)
+        self._queued: Dict[str, int] = defaultdict(int)
+        self._active = 0
+
+        # Per-client state is dropped once a client has been idle for client_idle_timeout
+        self._last_seen: Dict[str, float] = {}
+        self._last_sweep = clock()
+
+        self._stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "admitted": 0,
+            "completed": 0,
+            "rejected": defaultdict(int),
+            "total_wait": 0.0,
+            "max_wait": 0.0
+        })
+
+    @staticmethod
+    def _load_json_setting(name: str) -> Dict[str, Any]:
+        """Parse a JSON object setting, falling back to {} when it is invalid"""
+        raw = os.getenv(name)
+        if not raw:
+            return {}
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            print(f"Invalid {name} setting, using defaults: {e}")
+            return {}
+        if not isinstance(value, dict):
+            print(f"Invalid {name} setting, using defaults: expected a JSON object")
+            return {}
+        return value
+
+    @staticmethod
+    def _is_positive(value: Any) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+    @classmethod
+    def from_env(cls) -> "QueryScheduler":
+        """Create a scheduler from SCHEDULER_* settings"""
+        client_weights = {}
+        for client_id, weight in cls._load_json_setting("SCHEDULER_CLIENT_WEIGHTS").items():
+            if not cls._is_positive(weight):
+                print(f"Ignoring non-positive scheduler weight for client {client_id}: {weight}")
+                continue
+            client_weights[client_id] = float(weight)
+
+        tool_rates = {}
+        for tool, limits in cls._load_json_setting("SCHEDULER_TOOL_RATES").items():
+            if not (isinstance(limits, list) and len(limits) == 2
+                    and all(cls._is_positive(limit) for limit in limits)):
+                print(f"Ignoring invalid scheduler rate for tool {tool}: {limits}")
+                continue
+            tool_rates[tool] = (float(limits[0]), float(limits[1]))
+
+        return cls(
+            max_concurrency=int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "4")),
+            client_rate=float(os.getenv("SCHEDULER_CLIENT_RATE", "2")),
+            client_burst=float(os.getenv("SCHEDULER_CLIENT_BURST", "10")),
+            max_queue_per_client=int(os.getenv("SCHEDULER_MAX_QUEUE_PER_CLIENT", "10")),
+            queue_timeout=float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", "30")),
+            client_weights=client_weights,
+            tool_rates=tool_rates,
+            client_idle_timeout=float(os.getenv("SCHEDULER_CLIENT_IDLE_TIMEOUT", "600"))
+        )
+
+    def _evict_idle_clients(self):
+        """Forget clients with nothing queued that have been idle for client_idle_timeout"""
+        now = self.clock()
+        if now - self._last_sweep < min(60.0, self.client_idle_timeout):
+            return
+        self._last_sweep = now
+
+        for client_id, last_seen in list(self._last_seen.items()):
+            if now - last_seen < self.client_idle_timeout or self._queued.get(client_id):
+                continue
+            for state in (self._last_seen, self.client_buckets, self._stats,
+                          self._last_finish, self._queued):
+                state.pop(client_id, None)
+
+    def _reject(self, client_id: str, reason: str, message: str,
+                retry_after: Optional[float] = None):
+        self._stats[client_id]["rejected"][reason] += 1
+        raise SchedulerRejected(message, reason, retry_after)
+
+    def _admit(self, client_id: str, tool: str):
+        """Apply rate limits and queue bounds, raising SchedulerRejected on refusal"""
+        self._evict_idle_clients()
+        self._last_seen[client_id] = self.clock()
+
+        if self._queued[client_id] >= self.max_queue_per_client:
+            self._reject(client_id, "queue_full",
+                         f"Too many pending queries for client {client_id}")
+
+        bucket = self.client_buckets.get(client_id)
+        if bucket is None:
+            bucket = self.client_buckets[client_id] = TokenBucket(
+                self.client_rate, self.client_burst, self.clock)
+        tool_bucket = self.tool_buckets.get(tool)
+
+        if not bucket.try_acquire():
+            self._reject(client_id, "client_rate_limited",
+                         f"Rate limit exceeded for client {client_id}",
+                         bucket.retry_after())
+        if tool_bucket is not None and not tool_bucket.try_acquire():
+            bucket.tokens = min(bucket.capacity, bucket.tokens + 1)  # refund: never ran
+            self._reject(client_id, "tool_rate_limited",
+                         f"Rate limit exceeded for tool {tool}",
+                         tool_bucket.retry_after())
+
+    def _dispatch(self):
+        """Grant free concurrency slots to queued requests in finish-tag order"""
+        while self._active < self.max_concurrency and self._queue:
+            _, _, start_tag, client_id, future = heapq.heappop(self._queue)
+            if future.done():
+                continue  # waiter already gave up and left the queue
+            self._queued[client_id] -= 1
+            self._virtual_time = max(self._virtual_time, start_tag)
+            self._active += 1
+            future.set_result(None)
+
+    def _abandon(self, client_id: str, future: asyncio.Future):
+        """Drop a queued request whose caller stopped waiting"""
+        future.cancel()
+        self._queued[client_id] -= 1
+
+    async def run(self, client_id: str, tool: str,
+                  func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run func once the client is admitted and a concurrency slot is granted"""
+        self._admit(client_id, tool)
+        stats = self._stats[client_id]
+        enqueued_at = self.clock()
+
+        weight = self.client_weights.get(client_id, 1.0)
+        start_tag = max(self._virtual_time, self._last_finish[client_id])
+        finish_tag = start_tag + 1.0 / weight
+        self._last_finish[client_id] = finish_tag
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (finish_tag, next(self._sequence), start_tag, client_id, future))
+        self._queued[client_id] += 1
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._abandon(client_id, future)
+                self._reject(client_id, "queue_timeout",
+                             f"Query waited more than {self.queue_timeout} seconds in queue")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled; hand it on
+                self._active -= 1
+                self._dispatch()
+            else:
+                self._abandon(client_id, future)
+            raise
+
+        wait = self.clock() - enqueued_at
+        stats["admitted"] += 1
+        stats["total_wait"] += wait
+        stats["max_wait"] = max(stats["max_wait"], wait)
+
+        try:
+            return await func()
+        finally:
+            stats["completed"] += 1
+            self._last_seen[client_id] = self.clock()
+            self._active -= 1
+            self._dispatch()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, concurrency and wait-time metrics"""
+        clients = {}
+        for client_id, stats in self._stats.items():
+            admitted = stats["admitted"]
+            clients[client_id] = {
+                "queue_depth": self._queued.get(client_id, 0),
+                "admitted": admitted,
+                "completed": stats["completed"],
+                "rejected": dict(stats["rejected"]),
+                "avg_wait_seconds": stats["total_wait"] / admitted if admitted else 0.0,
+                "max_wait_seconds": stats["max_wait"]
+            }
+
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(self._queued.values()),
+            "clients": clients
+        }
@@ -1,12 +1,31 @@
 from fastmcp import FastMCP
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import os
 from .fabric_client import FabricClient
 from .tools import FabricTools
 from .resources import InsightsMemo
 from .prompts import FabricPrompts
+from .metrics import PrecomputedMetrics
+from .scheduler import QueryScheduler
+from .prompt_context import PromptContextBuilder
+from .query_stats import QueryStats
 
-def create_fabric_mcp_server() -> FastMCP:
+def create_fabric_client() -> FabricClient:
+    """Create a Fabric client from environment settings"""
+    return FabricClient(
+        tenant_id=os.getenv("FABRIC_TENANT_ID"),
+        client_id=os.getenv("FABRIC_CLIENT_ID"),
+        client_secret=os.getenv("FABRIC_CLIENT_SECRET"),
+        workspace_id=os.getenv("FABRIC_WORKSPACE_ID"),
+        lakehouse_id=os.getenv("FABRIC_LAKEHOUSE_ID")
+    )
+
+def create_fabric_tools() -> FabricTools:
+    """Create Fabric tools with the query scheduler and query stats from environment settings"""
+    return FabricTools(create_fabric_client(), QueryScheduler.from_env(), QueryStats.from_env())
+
+def create_fabric_mcp_server(tools: Optional[FabricTools] = None,
+                             metrics_store: Optional[PrecomputedMetrics] = None) -> FastMCP:
     """Create and configure the Fabric MCP server"""
     
     # Initialize FastMCP server
@@ -16,19 +35,17 @@ def create_fabric_mcp_server() -> FastMCP:
         description="Microsoft Fabric MCP Server with BI capabilities"
     )
     
-    # Initialize Fabric client
-    fabric_client = FabricClient(
-        tenant_id=os.getenv("FABRIC_TENANT_ID"),
-        client_id=os.getenv("FABRIC_CLIENT_ID"),
-        client_secret=os.getenv("FABRIC_CLIENT_SECRET"),
-        workspace_id=os.getenv("FABRIC_WORKSPACE_ID"),
-        lakehouse_id=os.getenv("FABRIC_LAKEHOUSE_ID")
-    )
-    
-    # Initialize components
-    tools = FabricTools(fabric_client)
+    # Initialize components (tools may be shared with the metrics timer trigger)
+    tools = tools or create_fabric_tools()
     insights_memo = InsightsMemo()
-    prompts = FabricPrompts()
+    metrics_store = metrics_store or PrecomputedMetrics()
+    prompts = FabricPrompts(metrics_store)
+    prompt_context = PromptContextBuilder(
+        tools,
+        insights_memo,
+        ttl=int(os.getenv("PROMPT_CONTEXT_TTL", "300")),
+        max_chars=int(os.getenv("PROMPT_CONTEXT_MAX_CHARS", "3000"))
+    )
     
     # Register tools
     @mcp.tool()
@@ -56,6 +73,11 @@ def create_fabric_mcp_server() -> FastMCP:
             tags=tags or []
         )
     
+    @mcp.tool()
+    async def get_precomputed_metric(name: str) -> Dict[str, Any]:
+        """Get a precomputed summary metric snapshot (refreshed on a schedule)"""
+        return metrics_store.get_metric(name)
+    
     # Register resources
     @mcp.resource("insights-memo")
     async def get_insights_memo() -> Dict[str, Any]:
@@ -69,18 +91,31 @@ def create_fabric_mcp_server() -> FastMCP:
             }
         }
     
+    @mcp.resource("scheduler-stats")
+    async def get_scheduler_stats() -> Dict[str, Any]:
+        """Get query scheduler queue depth and wait-time metrics"""
+        return tools.scheduler.get_metrics()
+    
+    @mcp.resource("query-stats")
+    async def get_query_stats() -> Dict[str, Any]:
+        """Get the most frequent and most expensive queries by fingerprint"""
+        return tools.query_stats.get_report()
+    
     # Register prompts
     @mcp.prompt("analyze-sales-data")
-    async def analyze_sales_prompt() -> str:
+    async def analyze_sales_prompt(include_context: bool = True) -> str:
         """Comprehensive sales data analysis prompt"""
-        return prompts.get_sales_analysis_prompt()
+        context = await prompt_context.get_context("sales") if include_context else ""
+        return prompts.get_sales_analysis_prompt(context)
     
     @mcp.prompt("generate-bi-report")
     async def bi_report_prompt(
         report_type: str = "executive",
-        time_period: str = "last_month"
+        time_period: str = "last_month",
+        include_context: bool = True
     ) -> str:
         """Generate a BI report based on current data"""
-        return prompts.get_bi_report_prompt(report_type, time_period)
+        context = await prompt_context.get_context(report_type) if include_context else ""
+        return prompts.get_bi_report_prompt(report_type, time_period, context)
     
     return mcp
\ No newline at end of file
@@ -1,13 +1,17 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import json
 import asyncio
+import time
 from datetime import datetime
+from .scheduler import SchedulerRejected, current_client_id
 
 class FabricTools:
     """Tools for interacting with Fabric data"""
     
-    def __init__(self, fabric_client):
+    def __init__(self, fabric_client, scheduler=None, query_stats=None):
         self.fabric_client = fabric_client
+        self.scheduler = scheduler
+        self.query_stats = query_stats
         self.query_timeout = 30  # seconds
     
     async def list_tables(self) -> Dict[str, Any]:
@@ -36,8 +40,50 @@ class FabricTools:
                 "error": str(e)
             }
     
-    async def execute_query(self, query: str) -> Dict[str, Any]:
-        """Execute a read-only query with timeout"""
+    async def execute_query(self, query: str, client_id: str = None,
+                            tool: str = "read_query") -> Dict[str, Any]:
+        """Execute a read-only query, subject to the scheduler's admission control"""
+        if self.scheduler is None:
+            result = await self._execute_query(query)
+        else:
+            try:
+                result = await self.scheduler.run(
+                    client_id or current_client_id.get(),
+                    tool,
+                    lambda: self._execute_query(query)
+                )
+            except SchedulerRejected as e:
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "reason": e.reason,
+                    "retry_after": e.retry_after
+                }
+        
+        # Outside the scheduled call so a slow flush never holds a concurrency slot
+        if self.query_stats is not None:
+            self.query_stats.maybe_flush()
+        
+        return result
+    
+    async def _execute_query(self, query: str) -> Dict[str, Any]:
+        """Execute a read-only query, recording its statistics when enabled"""
+        started = time.monotonic()
+        result, size = await self._run_query(query)
+        
+        if self.query_stats is not None:
+            self.query_stats.record(
+                query,
+                latency=time.monotonic() - started,
+                rows=result.get("row_count", 0),
+                size=size,
+                success=result["success"]
+            )
+        
+        return result
+    
+    async def _run_query(self, query: str) -> Tuple[Dict[str, Any], int]:
+        """Execute a read-only query with timeout, returning the response and payload size"""
         try:
             # Execute with timeout
             result = await asyncio.wait_for(
@@ -60,14 +106,14 @@ class FabricTools:
                 "row_count": result["row_count"],
                 "query": query,
                 "executed_at": datetime.now().isoformat()
-            }
+            }, result.get("bytes", 0)
         except asyncio.TimeoutError:
             return {
                 "success": False,
                 "error": f"Query timeout after {self.query_timeout} seconds"
-            }
+            }, 0
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e)
-            }
\ No newline at end of file
+            }, 0
\ No newline at end of file
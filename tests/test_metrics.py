@@ -0,0 +1,123 @@
+import pytest
+from src.metrics import PrecomputedMetrics
+from src.prompts import FabricPrompts
+
+class FakeTools:
+    """Stand-in for FabricTools returning canned query results"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.queries = []
+        self.tools = set()
+
+    async def execute_query(self, query: str, client_id: str = None, tool: str = "read_query"):
+        self.queries.append(query)
+        self.tools.add(tool)
+        if self.fail_on and self.fail_on in query:
+            return {"success": False, "error": "Query failed"}
+        return {
+            "success": True,
+            "columns": ["month", "revenue"],
+            "data": [{"month": 1, "revenue": 100}, {"month": 2, "revenue": 120}],
+            "row_count": 2
+        }
+
+METRIC_QUERIES = {
+    "monthly_sales_trend": {
+        "description": "Monthly revenue",
+        "query": "SELECT MONTH(order_date) AS month, SUM(revenue) AS revenue FROM sales_data s JOIN dim_date d ON s.date_id = d.id GROUP BY MONTH(order_date)"
+    },
+    "top_products": {
+        "description": "Top products",
+        "tables": ["sales_data"],
+        "query": "SELECT TOP 10 product_name FROM sales_data"
+    }
+}
+
+@pytest.mark.asyncio
+async def test_refresh_stores_snapshots(monkeypatch):
+    """Test that refresh stores compact snapshots with timestamp and source tables"""
+    monkeypatch.delenv("STORAGE_ACCOUNT_NAME", raising=False)
+    store = PrecomputedMetrics(METRIC_QUERIES)
+
+    tools = FakeTools()
+    result = await store.refresh(tools)
+    assert result["success"]
+    assert tools.tools == {"precomputed_metrics"}
+    assert result["refreshed"] == ["monthly_sales_trend", "top_products"]
+
+    metric = store.get_metric("monthly_sales_trend")
+    assert metric["success"]
+    assert metric["columns"] == ["month", "revenue"]
+    assert metric["rows"] == [[1, 100], [2, 120]]
+    assert metric["tables"] == ["dim_date", "sales_data"]
+    assert metric["computed_at"] is not None
+
+    assert store.get_metric("top_products")["tables"] == ["sales_data"]
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_previous_snapshot(monkeypatch):
+    """Test that a failing query does not drop the last good snapshot"""
+    monkeypatch.delenv("STORAGE_ACCOUNT_NAME", raising=False)
+    store = PrecomputedMetrics(METRIC_QUERIES)
+    await store.refresh(FakeTools())
+    computed_at = store.get_metric("top_products")["computed_at"]
+
+    result = await store.refresh(FakeTools(fail_on="TOP 10"))
+    assert not result["success"]
+    assert "top_products" in result["failed"]
+    assert store.get_metric("top_products")["computed_at"] == computed_at
+
+    missing = store.get_metric("unknown_metric")
+    assert not missing["success"]
+    assert len(missing["available_metrics"]) == 2
+
+@pytest.mark.asyncio
+async def test_prompts_reference_precomputed_metrics(monkeypatch):
+    """Test that BI prompts point only to metrics that have been computed"""
+    monkeypatch.delenv("STORAGE_ACCOUNT_NAME", raising=False)
+    store = PrecomputedMetrics(METRIC_QUERIES)
+    prompts = FabricPrompts(store)
+
+    # Nothing computed yet (fresh deploy): the prompts must not send the model to the tool
+    assert "get_precomputed_metric" not in prompts.get_sales_analysis_prompt()
+
+    await store.refresh(FakeTools(fail_on="TOP 10"))
+    for prompt in [prompts.get_sales_analysis_prompt(),
+                   prompts.get_bi_report_prompt("financial", "last_quarter")]:
+        assert "get_precomputed_metric" in prompt
+        assert "monthly_sales_trend" in prompt
+        assert "top_products" not in prompt
+
+    assert "get_precomputed_metric" not in FabricPrompts().get_sales_analysis_prompt()
+
+@pytest.mark.asyncio
+async def test_invalid_definitions_and_failed_refresh(monkeypatch):
+    """Test that definitions without a query are skipped and total failures keep last_refreshed"""
+    monkeypatch.delenv("STORAGE_ACCOUNT_NAME", raising=False)
+    monkeypatch.setenv("PRECOMPUTED_METRICS",
+                       '{"broken": {"description": "no query"}, "top": {"query": "SELECT TOP 10 x FROM t"}}')
+    store = PrecomputedMetrics()
+    assert store.metric_names() == ["top"]
+
+    result = await store.refresh(FakeTools(fail_on="TOP 10"))
+    assert result["failed"] == {"top": "Query failed"}
+    assert store.last_refreshed is None
+
+@pytest.mark.asyncio
+async def test_reload_keeps_newer_unsaved_snapshots(monkeypatch):
+    """Test that merging older stored snapshots does not roll back a fresh refresh"""
+    monkeypatch.delenv("STORAGE_ACCOUNT_NAME", raising=False)
+    store = PrecomputedMetrics(METRIC_QUERIES)
+    await store.refresh(FakeTools())
+    fresh = store.get_metric("monthly_sales_trend")["computed_at"]
+
+    stored = {
+        "monthly_sales_trend": {"computed_at": "2000-01-01T00:00:00", "rows": []},
+        "legacy_metric": {"computed_at": "2000-01-01T00:00:00", "rows": []}
+    }
+    store._merge_snapshots(stored, "2000-01-01T00:00:00")
+
+    assert store.get_metric("monthly_sales_trend")["computed_at"] == fresh
+    assert store.snapshots["legacy_metric"]["computed_at"] == "2000-01-01T00:00:00"
+    assert store.last_refreshed > "2000-01-01T00:00:00"
@@ -0,0 +1,123 @@
+import pytest
+from src.prompt_context import PromptContextBuilder
+from src.prompts import FabricPrompts
+from src.fabric_client import FabricClient
+
+class FakeTools:
+    """Stand-in for FabricTools serving canned metadata"""
+
+    def __init__(self, fail_stats: bool = False):
+        self.calls = 0
+        self.client_ids = set()
+        self.fail_stats = fail_stats
+
+    async def list_tables(self):
+        self.calls += 1
+        return {
+            "success": True,
+            "tables": [
+                {"name": "sales_data", "schema": "dbo", "type": "TABLE", "row_count": "Unknown"},
+                {"name": "hr_employees", "schema": "dbo", "type": "TABLE", "row_count": 40}
+            ]
+        }
+
+    async def execute_query(self, query: str, client_id: str = None, tool: str = "read_query"):
+        self.calls += 1
+        self.client_ids.add(client_id)
+        if "INFORMATION_SCHEMA" in query:
+            return {"success": True, "data": [
+                {"TABLE_NAME": "sales_data", "COLUMN_NAME": "order_date", "DATA_TYPE": "date"},
+                {"TABLE_NAME": "sales_data", "COLUMN_NAME": "revenue", "DATA_TYPE": "decimal"}
+            ]}
+        if self.fail_stats:
+            return {"success": False, "error": "Rate limit exceeded", "reason": "client_rate_limited"}
+        return {"success": True, "data": [
+            {"row_count": 1200, "min_date": "2023-01-01", "max_date": "2024-06-30"}
+        ]}
+
+class FakeMemo:
+    def get_recent_insights(self, category=None, keywords=None, limit=5):
+        return [{
+            "title": "Q2 revenue up",
+            "content": "Revenue grew 12%\nquarter over quarter",
+            "created_at": "2024-07-01T10:00:00"
+        }]
+
+@pytest.mark.asyncio
+async def test_context_contains_schema_stats_and_insights():
+    """Test that the context block describes matching tables and insights"""
+    builder = PromptContextBuilder(FakeTools(), FakeMemo())
+    context = await builder.get_context("sales")
+
+    assert "dbo.sales_data: 1200 rows, order_date from 2023-01-01 to 2024-06-30" in context
+    assert "order_date (date), revenue (decimal)" in context
+    assert "hr_employees" not in context
+    assert "Q2 revenue up: Revenue grew 12% quarter over quarter" in context
+
+    prompt = FabricPrompts().get_sales_analysis_prompt(context)
+    assert prompt.endswith(context)
+
+@pytest.mark.asyncio
+async def test_context_is_cached_and_size_bounded():
+    """Test that the context block is cached for the TTL and truncated to max_chars"""
+    tools = FakeTools()
+    builder = PromptContextBuilder(tools, FakeMemo(), ttl=300, max_chars=150)
+
+    first = await builder.get_context("sales")
+    calls = tools.calls
+    assert await builder.get_context("sales") == first
+    assert tools.calls == calls
+
+    assert len(first) <= 150
+    assert first.endswith("(truncated)")
+
+    # Unknown report types share the executive context, like the prompt templates
+    await builder.get_context("unknown")
+    assert set(builder._cache) == {"sales", "executive"}
+
+@pytest.mark.asyncio
+async def test_context_runs_as_internal_client_and_partial_results_expire_quickly():
+    """Test that context queries use their own client id and degraded blocks use the short TTL"""
+    tools = FakeTools(fail_stats=True)
+    builder = PromptContextBuilder(tools, FakeMemo(), ttl=300, partial_ttl=0)
+
+    context = await builder.get_context("sales")
+    assert "Unknown rows" in context
+    assert tools.client_ids == {"prompt-context"}
+
+    tools.fail_stats = False
+    assert "1200 rows" in await builder.get_context("sales")
+
+class ValidatingTools(FakeTools):
+    """FakeTools that applies the real FabricClient read-only validation"""
+
+    def __init__(self):
+        super().__init__()
+        self.client = FabricClient("test", "test", "test", "test", "test")
+
+    async def list_tables(self):
+        return {"success": True, "tables": [
+            {"name": "sales_data", "schema": "dbo", "row_count": "Unknown"},
+            {"name": "order_updates", "schema": "dbo", "row_count": "Unknown"}
+        ]}
+
+    async def execute_query(self, query: str, client_id: str = None, tool: str = "read_query"):
+        if not self.client._is_safe_query(query):
+            return {"success": False, "error": "Only SELECT queries are allowed"}
+        if "INFORMATION_SCHEMA" in query:
+            return {"success": True, "data": [
+                {"TABLE_NAME": "sales_data", "COLUMN_NAME": "created_at", "DATA_TYPE": "datetime2"}
+            ]}
+        return {"success": True, "data": [
+            {"row_count": 10, "min_date": "2024-01-01", "max_date": "2024-02-01"}
+        ]}
+
+@pytest.mark.asyncio
+async def test_context_queries_pass_read_only_validation():
+    """Test that names containing blocked keywords still produce a complete block"""
+    builder = PromptContextBuilder(ValidatingTools(), FakeMemo())
+    context, complete = await builder._build("sales")
+
+    assert complete
+    assert "created_at from 2024-01-01 to 2024-02-01" in context
+    assert "dbo.order_updates: 10 rows" in context
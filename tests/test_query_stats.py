@@ -0,0 +1,85 @@
+import pytest
+import json
+from src.query_stats import QueryStats, fingerprint_query, normalize_query
+from src.tools import FabricTools
+
+class FakeFabricClient:
+    async def execute_query(self, query: str):
+        return {"columns": [{"name": "id"}], "rows": [[1], [2]], "row_count": 2, "bytes": 24}
+
+def test_fingerprint_ignores_literals():
+    """Test that queries differing only in literals share a fingerprint"""
+    assert normalize_query(
+        "SELECT * FROM sales_data WHERE region = 'EU' AND qty > 10 AND id IN (1, 2, 3) -- note"
+    ) == "SELECT * FROM SALES_DATA WHERE REGION = ? AND QTY > ? AND ID IN (?)"
+
+    assert fingerprint_query("SELECT TOP 10 * FROM t2 WHERE x = 'a'") == \
+        fingerprint_query("select  top 5 *\nfrom t2 where x = N'it''s'")
+    assert fingerprint_query("SELECT * FROM t1") != fingerprint_query("SELECT * FROM t2")
+
+def test_comment_markers_inside_literals_are_not_comments():
+    """Test that "--" and "/*" inside string literals do not truncate the query"""
+    assert normalize_query("SELECT * FROM t WHERE note = 'a--b' AND id = 1") == \
+        "SELECT * FROM T WHERE NOTE = ? AND ID = ?"
+    assert normalize_query("SELECT * FROM t WHERE note = '/* x' /* real */ AND id = 1") == \
+        "SELECT * FROM T WHERE NOTE = ? AND ID = ?"
+    assert fingerprint_query("SELECT * FROM t WHERE note = 'a--b' AND id = 1") != \
+        fingerprint_query("SELECT * FROM t WHERE note = 'a--z' OR 1=1")
+
+def test_quoted_identifiers_and_leading_dot_decimals():
+    """Test that digits in quoted identifiers are kept and .5 style decimals are normalized"""
+    assert fingerprint_query("SELECT * FROM [Sales 2023]") != \
+        fingerprint_query("SELECT * FROM [Sales 2024]")
+    assert fingerprint_query('SELECT "q1 2023" FROM t') != \
+        fingerprint_query('SELECT "q1 2024" FROM t')
+    assert normalize_query("SELECT [x]]1] FROM [Sales 2023] WHERE rate > .5 AND qty < 2.") == \
+        "SELECT [X]]1] FROM [SALES 2023] WHERE RATE > ? AND QTY < ?"
+
+def test_aggregates_are_bounded_and_ranked():
+    """Test per-fingerprint aggregates, eviction and the slow-query ring buffer"""
+    stats = QueryStats(max_fingerprints=2, slow_log_size=2, slow_query_threshold=1.0)
+
+    stats.record("SELECT * FROM a WHERE id = 1", latency=0.5, rows=1, size=10)
+    stats.record("SELECT * FROM a WHERE id = 2", latency=2.0, rows=3, size=30)
+    stats.record("SELECT * FROM b", latency=1.5, rows=5, size=50, success=False)
+
+    top = stats.top(by="total_latency")
+    assert [entry["count"] for entry in top] == [2, 1]
+    assert top[0]["max_latency"] == 2.0
+    assert top[0]["rows"] == 4
+    assert top[0]["bytes"] == 40
+    assert top[0]["avg_latency"] == pytest.approx(1.25)
+    assert top[1]["errors"] == 1
+
+    # A third fingerprint evicts the least recently seen one
+    stats.record("SELECT * FROM c", latency=3.0)
+    assert stats.evicted == 1
+    assert all("FROM A" not in entry["normalized_query"] for entry in stats.top())
+
+    report = stats.get_report()
+    assert [q["latency"] for q in report["slowest_recent"]] == [3.0, 1.5]
+    assert report["slowest_recent"][0]["normalized_query"] == "SELECT * FROM C"
+    assert all("query" not in q for q in report["slowest_recent"])
+
+    with pytest.raises(ValueError):
+        stats.top(by="unknown")
+
+@pytest.mark.asyncio
+async def test_execute_query_records_stats_and_flushes(tmp_path):
+    """Test that FabricTools records executions and flushes to a local file"""
+    flush_path = tmp_path / "query_stats.jsonl"
+    stats = QueryStats(flush_target=str(flush_path), flush_interval=0)
+    tools = FabricTools(FakeFabricClient(), query_stats=stats)
+
+    for limit in (3, 5):
+        await tools.execute_query(f"SELECT id FROM sales_data WHERE id < {limit}")
+        await stats._flush_task
+
+    entry = stats.top()[0]
+    assert entry["count"] == 2
+    assert entry["rows"] == 4
+    assert entry["bytes"] == 48
+
+    snapshots = [json.loads(line) for line in flush_path.read_text().splitlines()]
+    assert len(snapshots) == 2
+    assert snapshots[-1]["fingerprints"][0]["count"] == 2
@@ -0,0 +1,151 @@
+import pytest
+import asyncio
+from src.scheduler import QueryScheduler, SchedulerRejected, TokenBucket
+from src.tools import FabricTools
+
+class FakeClock:
+    """Manually advanced clock for deterministic rate limiting"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class SlowFabricClient:
+    """Fabric client stub whose queries block until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+        self.order = []
+
+    async def execute_query(self, query: str):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.order.append(query)
+        await self.release.wait()
+        self.running -= 1
+        return {"columns": [{"name": "n"}], "rows": [[1]], "row_count": 1}
+
+def test_token_bucket_refills_over_time():
+    """Test token bucket burst capacity and refill rate"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+    assert all(bucket.try_acquire() for _ in range(3))
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(0.5)
+
+    clock.now = 1.0
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+@pytest.mark.asyncio
+async def test_rate_limits_per_client_and_tool():
+    """Test that a noisy client is throttled without affecting others"""
+    clock = FakeClock()
+    scheduler = QueryScheduler(client_rate=1, client_burst=2, clock=clock,
+                               tool_rates={"read_query": (1, 3)})
+
+    async def query():
+        return {"success": True}
+
+    await scheduler.run("noisy", "read_query", query)
+    await scheduler.run("noisy", "read_query", query)
+    with pytest.raises(SchedulerRejected) as exc:
+        await scheduler.run("noisy", "read_query", query)
+    assert exc.value.reason == "client_rate_limited"
+    assert exc.value.retry_after == pytest.approx(1.0)
+
+    await scheduler.run("quiet", "read_query", query)
+    with pytest.raises(SchedulerRejected) as exc:
+        await scheduler.run("quiet", "read_query", query)
+    assert exc.value.reason == "tool_rate_limited"
+
+    metrics = scheduler.get_metrics()
+    assert metrics["clients"]["noisy"]["rejected"] == {"client_rate_limited": 1}
+    assert metrics["clients"]["quiet"]["admitted"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_fair_queuing_and_bounded_queues():
+    """Test a simulated mix of heavy and light clients sharing the capacity"""
+    client = SlowFabricClient()
+    scheduler = QueryScheduler(max_concurrency=2, client_burst=100,
+                               max_queue_per_client=4,
+                               client_weights={"light": 2.0})
+    tools = FabricTools(client, scheduler)
+
+    heavy = [asyncio.create_task(tools.execute_query(f"heavy {i}", client_id="heavy"))
+             for i in range(6)]
+    await asyncio.sleep(0.01)
+    light = [asyncio.create_task(tools.execute_query(f"light {i}", client_id="light"))
+             for i in range(2)]
+    await asyncio.sleep(0.01)
+
+    # Two heavy queries run and four wait; a further heavy query is rejected fast
+    metrics = scheduler.get_metrics()
+    assert metrics["active"] == 2
+    assert metrics["clients"]["heavy"]["queue_depth"] == 4
+    assert metrics["clients"]["light"]["queue_depth"] == 2
+    overflow = await tools.execute_query("heavy overflow", client_id="heavy")
+    assert overflow["reason"] == "queue_full"
+
+    client.release.set()
+    results = await asyncio.gather(*heavy, *light)
+
+    assert all(result["success"] for result in results)
+    assert client.max_running == 2
+    # The light client is served ahead of the heavy client's backlog
+    assert client.order[2:4] == ["light 0", "light 1"]
+    assert scheduler.get_metrics()["queue_depth"] == 0
+
+@pytest.mark.asyncio
+async def test_queue_timeout_rejects_waiting_query():
+    """Test that queries waiting too long for a slot are rejected"""
+    client = SlowFabricClient()
+    scheduler = QueryScheduler(max_concurrency=1, queue_timeout=0.01)
+    tools = FabricTools(client, scheduler)
+
+    running = asyncio.create_task(tools.execute_query("first", client_id="a"))
+    await asyncio.sleep(0.01)
+    result = await tools.execute_query("second", client_id="b")
+
+    assert not result["success"]
+    assert result["reason"] == "queue_timeout"
+    assert scheduler.get_metrics()["clients"]["b"]["queue_depth"] == 0
+
+    client.release.set()
+    assert (await running)["success"]
+
+def test_from_env_ignores_invalid_settings(monkeypatch):
+    """Test that malformed JSON and non-positive weights fall back to defaults"""
+    monkeypatch.setenv("SCHEDULER_TOOL_RATES", "{not json")
+    monkeypatch.setenv("SCHEDULER_CLIENT_WEIGHTS", '{"a": 0, "b": -1, "c": 2}')
+    scheduler = QueryScheduler.from_env()
+
+    assert scheduler.tool_buckets == {}
+    assert scheduler.client_weights == {"c": 2.0}
+
+    with pytest.raises(ValueError):
+        QueryScheduler(client_weights={"a": 0})
+
+@pytest.mark.asyncio
+async def test_idle_client_state_is_evicted():
+    """Test that per-client state is dropped after the idle timeout"""
+    clock = FakeClock()
+    scheduler = QueryScheduler(client_idle_timeout=60, clock=clock)
+
+    async def query():
+        return {"success": True}
+
+    for i in range(3):
+        await scheduler.run(f"client-{i}", "read_query", query)
+    assert len(scheduler.client_buckets) == 3
+
+    clock.now = 120.0
+    await scheduler.run("client-0", "read_query", query)
+    assert list(scheduler.client_buckets) == ["client-0"]
+    assert list(scheduler.get_metrics()["clients"]) == ["client-0"]
@@ -27,7 +27,8 @@ async def test_query_validation():
         "DELETE FROM users",
         "DROP TABLE accounts",
         "UPDATE products SET price = 0",
-        "INSERT INTO logs VALUES ('hack')"
+        "INSERT INTO logs VALUES ('hack')",
+        "select 1; exec sp_who"
     ]
     
     for query in dangerous_queries:
@@ -37,7 +38,9 @@ async def test_query_validation():
     safe_queries = [
         "SELECT * FROM products",
         "SELECT COUNT(*) FROM users WHERE active = true",
-        "SELECT name, price FROM products ORDER BY price DESC"
+        "SELECT name, price FROM products ORDER BY price DESC",
+        "SELECT MIN([created_at]) FROM sales_data",
+        "SELECT * FROM order_updates WHERE deleted_flag = 0"
     ]
     
     for query in safe_queries: